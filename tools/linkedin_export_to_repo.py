@@ -1,9 +1,13 @@
 #!/usr/bin/env python3
 import csv
 import hashlib
+import io
+import json
 import os
 import re
+import shlex
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
@@ -33,42 +37,93 @@ TEXT_COL_CANDIDATES = (
 DATE_COL_CANDIDATES = ("date", "timestamp", "time", "created at", "createdat")
 URL_COL_CANDIDATES  = ("url", "link", "permalink")
 
-def run(cmd, cwd=None):
-    subprocess.run(cmd, cwd=cwd, check=True)
+# Read CSVs through a 1 MiB buffer; the default 8 KiB one means many more
+# read() syscalls on multi-megabyte exports.
+_CSV_BUFFER = 1 << 20
+
+def open_csv(path):
+    return io.TextIOWrapper(
+        open(path, "rb", buffering=_CSV_BUFFER),
+        encoding="utf-8-sig",
+        newline="",
+    )
+
+# Pre-compiled patterns (avoids re-cache lookups in the per-row hot path)
+_SLUG_NONALNUM = re.compile(r"[^a-z0-9]+")
+_SLUG_DUPDASH = re.compile(r"-{2,}")
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}")
+_BLOCKED_RE = re.compile("|".join(map(re.escape, BLOCKED_FILE_HINTS)))
+_ALLOWED_RE = re.compile("|".join(map(re.escape, ALLOWED_FILE_HINTS)))
+
+# Non-ISO formats parse_date falls back to; warmed up once at import so
+# _strptime compiles its per-format regexes outside the row loop.
+_DATE_FORMATS = (
+    "%Y-%m-%d",
+    "%d/%m/%Y",
+    "%m/%d/%Y",
+    "%Y-%m-%d %H:%M:%S",
+    "%d/%m/%Y %H:%M:%S",
+)
+for _fmt in _DATE_FORMATS:
+    try:
+        datetime.strptime("2000-01-01", _fmt)
+    except ValueError:
+        pass
+
+# Lowercase A-Z and map every other non-alphanumeric ASCII char to "-" in a
+# single translate() pass; the dup-dash pass below collapses the runs.
+_SLUG_TABLE = {c: c + 32 for c in range(ord("A"), ord("Z") + 1)}
+for _c in range(128):
+    if _c not in _SLUG_TABLE and not ("a" <= chr(_c) <= "z" or "0" <= chr(_c) <= "9"):
+        _SLUG_TABLE[_c] = ord("-")
 
 def slugify(s: str) -> str:
-    s = s.strip().lower()
-    s = re.sub(r"[^a-z0-9]+", "-", s)
-    s = re.sub(r"-{2,}", "-", s).strip("-")
+    s = s.strip()
+    if s.isascii():
+        s = s.translate(_SLUG_TABLE)
+    else:
+        # Non-ASCII previews still need full Unicode lowering + regex strip
+        s = _SLUG_NONALNUM.sub("-", s.lower())
+    s = _SLUG_DUPDASH.sub("-", s).strip("-")
     return s[:80] if s else "post"
 
-def sha1(text: str) -> str:
-    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+def short_digest(data, size: int = 5) -> str:
+    # Non-cryptographic content id; blake2b emits exactly the hex length
+    # we need without truncation and is faster than sha1 here.
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.blake2b(data, digest_size=size).hexdigest()
 
-def parse_date(s: str) -> str:
+def parse_date(s: str, default: str = None) -> str:
     s = (s or "").strip()
-    for fmt in (
-        "%Y-%m-%d",
-        "%d/%m/%Y",
-        "%m/%d/%Y",
-        "%Y-%m-%d %H:%M:%S",
-        "%d/%m/%Y %H:%M:%S",
+    # Fast path: LinkedIn's canonical timestamps are ISO ("YYYY-MM-DD ...");
+    # a cheap shape check avoids strptime (and its exception machinery) per row.
+    if (
+        len(s) >= 10
+        and s[4] == "-"
+        and s[7] == "-"
+        and s[:4].isdigit()
+        and s[5:7].isdigit()
+        and s[8:10].isdigit()
     ):
+        return s[:10]
+    for fmt in _DATE_FORMATS:
         try:
             return datetime.strptime(s, fmt).strftime("%Y-%m-%d")
         except ValueError:
             pass
-    if re.match(r"^\d{4}-\d{2}-\d{2}", s):
+    if _ISO_DATE.match(s):
         return s[:10]
-    return datetime.now().strftime("%Y-%m-%d")
+    return default or datetime.now().strftime("%Y-%m-%d")
 
-def is_blocked_csv(path: Path) -> bool:
+def classify_csv(path: Path) -> str:
+    """Classify a CSV by filename hint: 'blocked', 'allowed' or 'other'."""
     name = path.name.lower()
-    return any(k in name for k in BLOCKED_FILE_HINTS)
-
-def is_allowed_csv(path: Path) -> bool:
-    name = path.name.lower()
-    return any(k in name for k in ALLOWED_FILE_HINTS)
+    if _BLOCKED_RE.search(name):
+        return "blocked"
+    if _ALLOWED_RE.search(name):
+        return "allowed"
+    return "other"
 
 def sniff_posts_csv(export_dir: Path):
     """
@@ -76,7 +131,8 @@ def sniff_posts_csv(export_dir: Path):
     - ignore blocked (messages, learning, etc.)
     - require allowed filename hint (posts/shares/updates/ugc/article/activity)
     - must have a plausible text column (NOT subject/message)
-    - prefer files with more non-empty rows
+    - short-circuit on a strong filename hint (posts/shares)
+    - otherwise sample a few rows and prefer files with more non-empty ones
     Returns: (csv_path, text_col, date_col, url_col)
     """
     csv_files = list(export_dir.rglob("*.csv"))
@@ -85,19 +141,18 @@ def sniff_posts_csv(export_dir: Path):
 
     candidates = []
     for p in csv_files:
-        if is_blocked_csv(p):
-            continue
-        if not is_allowed_csv(p):
-            # keep conservative: skip random profile CSVs
+        if classify_csv(p) != "allowed":
+            # keep conservative: skip blocked and random profile CSVs
             continue
 
         try:
-            with p.open("r", encoding="utf-8-sig", newline="") as f:
-                reader = csv.DictReader(f)
-                if not reader.fieldnames:
+            with open_csv(p) as f:
+                reader = csv.reader(f)
+                fieldnames = next(reader, None)
+                if not fieldnames:
                     continue
 
-                headers = {h.strip().lower(): h for h in reader.fieldnames}
+                headers = {h.strip().lower(): h for h in fieldnames}
 
                 text_col = None
                 for cand in TEXT_COL_CANDIDATES:
@@ -110,13 +165,21 @@ def sniff_posts_csv(export_dir: Path):
                 date_col = next((headers[c] for c in DATE_COL_CANDIDATES if c in headers), None)
                 url_col  = next((headers[c] for c in URL_COL_CANDIDATES if c in headers), None)
 
+                text_idx = fieldnames.index(text_col)
+
+                # Strong filename hint + a text column is decisive; return
+                # right away instead of scanning and scoring every candidate.
+                name = p.name.lower()
+                if "posts" in name or "shares" in name:
+                    return p, text_col, date_col, url_col
+
                 nonempty = 0
                 checked = 0
                 for row in reader:
                     checked += 1
-                    if (row.get(text_col) or "").strip():
+                    if len(row) > text_idx and row[text_idx].strip():
                         nonempty += 1
-                    if checked >= 3000:
+                    if checked >= 50:
                         break
 
                 if nonempty < 1:
@@ -156,53 +219,154 @@ def main():
 
     created = 0
     updated = 0
+    today = datetime.now().strftime("%Y-%m-%d")
+
+    # Cache of fname -> content digest from the previous run; lets re-runs
+    # skip reading back files whose content cannot have changed.
+    index_path = OUT_DIR / ".index.json"
+    try:
+        index_text = index_path.read_text(encoding="utf-8")
+        index = json.loads(index_text)
+    except Exception:
+        index_text = ""
+        index = {}
+
+    # One directory read up front instead of a stat() per row below.
+    existing = {e.name for e in os.scandir(OUT_DIR)}
+
+    # Reshares and overlapping CSV sources repeat post texts; hash each
+    # distinct text once.
+    digest_cache: dict[str, str] = {}
+    out_dir = str(OUT_DIR)
+
+    def write_one(task):
+        """Compare-or-write a single post; returns 'created', 'updated' or None.
+
+        Safe to run from worker threads: set/dict mutation is atomic under
+        the GIL, and the submit loop dedupes by filename so each file has
+        exactly one writer per run.
+        """
+        path, fname, content_bytes, content_digest = task
+        result = None
+        if fname in existing:
+            if index.get(fname) != content_digest:
+                with open(path, "rb") as fh:
+                    old = fh.read()
+                if old != content_bytes:
+                    with open(path, "wb") as fh:
+                        fh.write(content_bytes)
+                    result = "updated"
+        else:
+            with open(path, "wb") as fh:
+                fh.write(content_bytes)
+            existing.add(fname)
+            result = "created"
+        index[fname] = content_digest
+        return result
+
+    # Single pass: rows are parsed, digested and handed to the pool as they
+    # stream off the CSV, so writes overlap with reading the next rows.
+    # Repeated filenames (duplicate texts across sources) are deferred and
+    # replayed sequentially afterwards, so no two tasks race on one file
+    # and the last occurrence wins like it did in the sequential loop.
+    futures = []
+    seen_fnames = set()
+    deferred = {}
+    with open_csv(csv_path) as f, \
+            ThreadPoolExecutor(max_workers=8) as pool:
+        reader = csv.reader(f)
+        fieldnames = next(reader, [])
+        # Resolve the three columns to integer indices once; plain csv.reader
+        # then avoids DictReader's per-row dict allocation and key lookups.
+        text_idx = fieldnames.index(text_col)
+        date_idx = fieldnames.index(date_col) if date_col else -1
+        url_idx = fieldnames.index(url_col) if url_col else -1
 
-    with csv_path.open("r", encoding="utf-8-sig", newline="") as f:
-        reader = csv.DictReader(f)
         for row in reader:
-            text = (row.get(text_col) or "").strip()
+            text = row[text_idx].strip() if len(row) > text_idx else ""
             if not text:
                 continue
 
-            date = parse_date(row.get(date_col) if date_col else "")
-            url = (row.get(url_col) or "").strip() if url_col else ""
+            date = parse_date(row[date_idx] if 0 <= date_idx < len(row) else "", default=today)
+            url = row[url_idx].strip() if 0 <= url_idx < len(row) else ""
 
-            preview = text.splitlines()[0][:80]
+            # One scan for the first line, one encode of the body; the
+            # encoded bytes feed the digest, the file content and the write.
+            nl = text.find("\n")
+            preview = text[: nl if 0 <= nl < 80 else 80]
             slug = slugify(preview)
-            digest = sha1(text)[:10]
+            text_bytes = text.encode("utf-8")
+            digest = digest_cache.get(text)
+            if digest is None:
+                digest = digest_cache[text] = short_digest(text_bytes)
 
             fname = f"{date}-{slug}-{digest}.md"
-            path = OUT_DIR / fname
-
-            lines = ["---", f"date: {date}", "platform: linkedin"]
-            if url:
-                lines.append(f"source: {url}")
-            lines += ["---", "", text, ""]
+            # The filename embeds the date and the text digest; with no
+            # source url those determine the whole file, so an existing
+            # name guarantees identical content — skip without reading.
+            if not url and fname in existing:
+                continue
+            path = os.path.join(out_dir, fname)
 
-            content = "\n".join(lines)
+            src_line = f"source: {url}\n" if url else ""
+            head = f"---\ndate: {date}\nplatform: linkedin\n{src_line}---\n\n"
+            content_bytes = head.encode("utf-8") + text_bytes + b"\n"
+            content_digest = short_digest(content_bytes, size=8)
 
-            if path.exists():
-                old = path.read_text(encoding="utf-8")
-                if old == content:
-                    continue
-                path.write_text(content, encoding="utf-8")
-                updated += 1
+            task = (path, fname, content_bytes, content_digest)
+            if fname in seen_fnames:
+                deferred[fname] = task
             else:
-                path.write_text(content, encoding="utf-8")
-                created += 1
+                seen_fnames.add(fname)
+                futures.append(pool.submit(write_one, task))
+
+    for fut in futures:
+        result = fut.result()
+        if result == "created":
+            created += 1
+        elif result == "updated":
+            updated += 1
+
+    # Pool is drained here, so replaying the duplicates can't race the
+    # first writes of the same files.
+    for task in deferred.values():
+        result = write_one(task)
+        if result == "created":
+            created += 1
+        elif result == "updated":
+            updated += 1
+
+    # Rewrite the (gitignored) index only when it actually changed so no-op
+    # runs leave the working tree untouched.
+    new_index_text = json.dumps(index, indent=0, sort_keys=True)
+    if new_index_text != index_text:
+        index_path.write_text(new_index_text, encoding="utf-8")
 
     print(f"Selected CSV: {csv_path}")
     print(f"Text column: {text_col}")
     print(f"New posts: {created}, Updated: {updated}")
 
-    # Git commit/push only if changes exist
+    # The counters already tell us whether anything was written; skip the
+    # git subprocess entirely on no-op runs.
+    if created == 0 and updated == 0:
+        print("No archive changes to commit.")
+        return
+
+    # Git commit/push only if changes exist; one shell invocation instead
+    # of a fork+exec per git subcommand.
     try:
-        run(["git", "add", str(OUT_DIR)])
-        status = subprocess.check_output(["git", "status", "--porcelain"], text=True).strip()
-        if status:
-            msg = f"Import LinkedIn posts ({created} new, {updated} updated)"
-            run(["git", "commit", "-m", msg])
-            run(["git", "push"])
+        msg = f"Import LinkedIn posts ({created} new, {updated} updated)"
+        # Exclude the local digest cache at the staging site so it stays
+        # out of archive commits whatever LINKEDIN_OUT_DIR points at.
+        exclude = shlex.quote(f":(exclude){OUT_DIR}/.index.json")
+        script = (
+            f"git add {shlex.quote(str(OUT_DIR))} {exclude} && "
+            'if [ -n "$(git status --porcelain)" ]; then '
+            f"git commit -m {shlex.quote(msg)} && git push && echo committed; "
+            "else echo clean; fi"
+        )
+        out = subprocess.check_output(script, shell=True, text=True)
+        if "committed" in out:
             print("Committed and pushed archive repo.")
         else:
             print("No archive changes to commit.")